@@ -38,4 +38,7 @@ def start_app(args):
         app="fooocusapi.api:app",
         host=args.host,
         port=args.port,
+        loop=args.loop,
+        http=args.http,
+        limit_concurrency=args.limit_concurrency,
         log_level=args.log_level)
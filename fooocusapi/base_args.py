@@ -18,10 +18,15 @@ def add_base_args(parser: ArgumentParser, before_prepared: bool):
     parser.add_argument("--host", type=str, default='0.0.0.0', help="Set the listen host, default: 127.0.0.1")
     parser.add_argument("--base-url", type=str, default=None, help="Set base url for outside visit, default is http://host:port")
     parser.add_argument("--log-level", type=str, default='info', help="Log info for Uvicorn, default: info")
+    parser.add_argument("--loop", type=str, default='auto', choices=['auto', 'asyncio', 'uvloop'], help="Event loop for Uvicorn, default: auto, uvloop when installed")
+    parser.add_argument("--http", type=str, default='auto', choices=['auto', 'h11', 'httptools'], help="HTTP protocol for Uvicorn, default: auto, httptools when installed")
+    parser.add_argument("--limit-concurrency", type=int, default=None, help="Max concurrent connections before Uvicorn returns 503, default: None, means no limit")
     parser.add_argument("--skip-pip", default=False, action="store_true", help="Skip automatic pip install when setup")
     parser.add_argument("--preload-pipeline", default=False, action="store_true", help="Preload pipeline before start http server")
     parser.add_argument("--queue-size", type=int, default=100, help="Working queue size, default: 100, generation requests exceeding working queue size will return failure")
     parser.add_argument("--queue-history", type=int, default=0, help="Finished jobs reserve size, tasks exceeding the limit will be deleted, including output image files, default: 0, means no limit")
+    parser.add_argument("--cv-workers", type=int, default=1, help="Max concurrent describe-image and generate-mask jobs, default: 1")
+    parser.add_argument("--mask-cache-mb", type=int, default=256, help="Disk space in MB for generated masks kept as PNG under outputs/mask_cache for repeated generate-mask requests, default: 256, 0 to disable")
     parser.add_argument('--webhook-url', type=str, default=None, help='The URL to send a POST request when a job is finished')
     parser.add_argument('--persistent', default=False, action="store_true", help="Store history to db")
     parser.add_argument("--apikey", type=str, default="AIzaSyD7Q7J9Q", help="API key for authenticating requests")
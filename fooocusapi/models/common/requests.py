@@ -2,6 +2,7 @@
 from typing import List
 from pydantic import (
     BaseModel,
+    ConfigDict,
     Field,
     ValidationError
 )
@@ -77,6 +78,11 @@ class AdvancedParams(BaseModel):
 
 class CommonRequest(BaseModel):
     """All generate request based on this model"""
+    model_config = ConfigDict(
+        validate_assignment=False,
+        extra='ignore'
+    )
+
     prompt: str = ''
     negative_prompt: str = default_prompt_negative
     style_selections: List[str] = default_styles
@@ -112,8 +118,7 @@ def advanced_params_parser(advanced_params: str | None) -> AdvancedParams:
     """
     if advanced_params is not None and len(advanced_params) > 0:
         try:
-            advanced_params_obj = AdvancedParams.__pydantic_validator__.validate_json(advanced_params)
-            return AdvancedParams(**advanced_params_obj)
+            return AdvancedParams.model_validate_json(advanced_params)
         except ValidationError:
             return AdvancedParams()
     return AdvancedParams()
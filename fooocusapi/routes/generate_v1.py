@@ -1,14 +1,23 @@
 """Generate API V1 routes
 
 """
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Header, Query, UploadFile
+import asyncio
+import functools
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Callable, Dict, Optional
+import numpy as np
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from fastapi.params import File
 
 from modules.util import HWC3
 
+from fooocusapi.args import args
 from fooocusapi.models.common.base import DescribeImageType
-from fooocusapi.utils.api_utils import api_key_auth
+from fooocusapi.utils.api_utils import api_key_auth, AcceptParam
 
 from fooocusapi.models.common.requests import CommonRequest as Text2ImgRequest
 from fooocusapi.models.requests_v1 import (
@@ -17,141 +26,206 @@ from fooocusapi.models.requests_v1 import (
     ImgInpaintOrOutpaintRequest
 )
 from fooocusapi.models.common.response import (
-    AsyncJobResponse,
-    GeneratedImageResult,
     DescribeImageResponse,
     StopResponse
 )
-from fooocusapi.utils.call_worker import call_worker
-from fooocusapi.utils.img_utils import read_input_image
+from fooocusapi.utils.call_worker import call_worker_async
+from fooocusapi.utils.img_utils import (
+    read_input_image,
+    read_upload_stream,
+    bytesimg_to_narray,
+    narray_to_base64img,
+    buffer_upload
+)
+from fooocusapi.utils.mask_cache import (
+    mask_cache_key,
+    get_cached_mask,
+    save_cached_mask
+)
+from fooocusapi.utils.logger import logger
 from fooocusapi.configs.default import img_generate_responses
 from fooocusapi.worker import process_stop
 
 
 secure_router = APIRouter(
-    dependencies=[Depends(api_key_auth)]
+    dependencies=[Depends(api_key_auth)],
+    default_response_class=ORJSONResponse
 )
 
+# Form request dependencies, declared once like AcceptParam
+ImgUpscaleOrVaryForm = Annotated[ImgUpscaleOrVaryRequest, Depends(ImgUpscaleOrVaryRequest.as_form)]
+ImgInpaintOrOutpaintForm = Annotated[ImgInpaintOrOutpaintRequest, Depends(ImgInpaintOrOutpaintRequest.as_form)]
+ImgPromptForm = Annotated[ImgPromptRequest, Depends(ImgPromptRequest.as_form)]
+
+# Interrogation results keyed on (image_type, blake2b digest of the upload)
+DESCRIBE_CACHE_SIZE = 256
+describe_cache: OrderedDict = OrderedDict()
+# Running interrogations, concurrent requests for the same upload share one
+describe_inflight: Dict[tuple, asyncio.Task] = {}
+
+interrogators: Dict[DescribeImageType, Callable] = {}
+
+# Interrogator and mask models run here, bounded and apart from the request threadpool
+cv_executor = ThreadPoolExecutor(max_workers=args.cv_workers, thread_name_prefix="fooocus-cv")
+
 
 def stop_worker():
     """Interrupt worker process"""
     process_stop()
 
 
+async def buffer_request_uploads(req: Text2ImgRequest):
+    """Read all uploaded files of a form request into memory"""
+    for field in ('input_image', 'input_mask'):
+        if hasattr(req, field):
+            setattr(req, field, await buffer_upload(getattr(req, field)))
+    for image_prompt in getattr(req, 'image_prompts', []):
+        image_prompt.cn_img = await buffer_upload(image_prompt.cn_img)
+
+
+async def run_cv_task(func: Callable, *func_args):
+    """Run a describe or mask model call on the bounded cv executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cv_executor, func, *func_args)
+
+
+def get_interrogator(image_type: DescribeImageType) -> Callable:
+    """Import the interrogator for image_type on first use, then reuse it"""
+    interrogator = interrogators.get(image_type)
+    if interrogator is None:
+        if image_type == DescribeImageType.photo:
+            from extras.interrogate import default_interrogator as interrogator
+        else:
+            from extras.wd14tagger import default_interrogator as interrogator
+        interrogators[image_type] = interrogator
+    return interrogator
+
+
+def interrogate_image(image_type: DescribeImageType, img: np.ndarray) -> str:
+    """Interrogate an image, run on the cv executor so the first import stays off the event loop"""
+    return get_interrogator(image_type)(img)
+
+
+async def interrogate_upload(cache_key: tuple, image_bytes: bytes, image_type: DescribeImageType) -> str:
+    """Decode and interrogate an uploaded image, caching the result"""
+    img = await run_in_threadpool(decode_upload_image, image_bytes)
+    result = await run_cv_task(interrogate_image, image_type, img)
+
+    describe_cache[cache_key] = result
+    if len(describe_cache) > DESCRIBE_CACHE_SIZE:
+        describe_cache.popitem(last=False)
+    return result
+
+
+def describe_task_done(cache_key: tuple, task: asyncio.Task):
+    """Drop a finished interrogation from describe_inflight, logging its failure"""
+    describe_inflight.pop(cache_key, None)
+    # Retrieved here too, the requests waiting on it may all have disconnected
+    if not task.cancelled() and task.exception() is not None:
+        logger.std_warn(f"[Fooocus API] Describe image failed: {task.exception()}")
+
+
+def decode_upload_image(image_data: bytes):
+    """Decode uploaded image data to an HWC3 array for interrogators and mask models"""
+    img = bytesimg_to_narray(image_data)
+    if img is None:
+        # Formats OpenCV can't read still go through PIL
+        img = read_input_image(image_data)
+    # Grayscale and RGBA (blended onto white) go through HWC3
+    if not (img.ndim == 3 and img.shape[2] == 3 and img.dtype == np.uint8 and img.flags.c_contiguous):
+        img = HWC3(img)
+    return img
+
+
 @secure_router.post(
         path="/v1/generation/text-to-image",
-        response_model=List[GeneratedImageResult] | AsyncJobResponse,
+        response_model=None,
         responses=img_generate_responses,
         tags=["GenerateV1"])
-def text2img_generation(
+async def text2img_generation(
     req: Text2ImgRequest,
-    accept: str = Header(None),
-    accept_query: str | None = Query(
-        None, alias='accept',
-        description="Parameter to override 'Accept' header, 'image/png' for output bytes")):
+    accept: AcceptParam):
     """\nText to Image Generation\n
     A text to image generation endpoint
     Arguments:
         req {Text2ImgRequest} -- Text to image generation request
-        accept {str} -- Accept header
-        accept_query {str} -- Parameter to override 'Accept' header, 'image/png' for output bytes
+        accept {str} -- Accept header, overridden by the 'accept' query parameter
     returns:
         Response -- img_generate_responses
     """
-    if accept_query is not None and len(accept_query) > 0:
-        accept = accept_query
-
-    return call_worker(req, accept)
+    return await call_worker_async(req, accept)
 
 
 @secure_router.post(
         path="/v1/generation/image-upscale-vary",
-        response_model=List[GeneratedImageResult] | AsyncJobResponse,
+        response_model=None,
         responses=img_generate_responses,
         tags=["GenerateV1"])
-def img_upscale_or_vary(
+async def img_upscale_or_vary(
     input_image: UploadFile,
-    req: ImgUpscaleOrVaryRequest = Depends(ImgUpscaleOrVaryRequest.as_form),
-    accept: str = Header(None),
-    accept_query: str | None = Query(
-        None, alias='accept',
-        description="Parameter to override 'Accept' header, 'image/png' for output bytes")):
+    req: ImgUpscaleOrVaryForm,
+    accept: AcceptParam):
     """\nImage upscale or vary\n
     Image upscale or vary
     Arguments:
         input_image {UploadFile} -- Input image file
         req {ImgUpscaleOrVaryRequest} -- Request body
-        accept {str} -- Accept header
-        accept_query {str} -- Parameter to override 'Accept' header, 'image/png' for output bytes
+        accept {str} -- Accept header, overridden by the 'accept' query parameter
     Returns:
         Response -- img_generate_responses
     """
-    if accept_query is not None and len(accept_query) > 0:
-        accept = accept_query
-
-    return call_worker(req, accept)
+    await buffer_request_uploads(req)
+    return await call_worker_async(req, accept)
 
 
 @secure_router.post(
         path="/v1/generation/image-inpaint-outpaint",
-        response_model=List[GeneratedImageResult] | AsyncJobResponse,
+        response_model=None,
         responses=img_generate_responses,
         tags=["GenerateV1"])
-def img_inpaint_or_outpaint(
+async def img_inpaint_or_outpaint(
     input_image: UploadFile,
-    req: ImgInpaintOrOutpaintRequest = Depends(ImgInpaintOrOutpaintRequest.as_form),
-    accept: str = Header(None),
-    accept_query: str | None = Query(
-        None, alias='accept',
-        description="Parameter to override 'Accept' header, 'image/png' for output bytes")):
+    req: ImgInpaintOrOutpaintForm,
+    accept: AcceptParam):
     """\nInpaint or outpaint\n
     Inpaint or outpaint
     Arguments:
         input_image {UploadFile} -- Input image file
         req {ImgInpaintOrOutpaintRequest} -- Request body
-        accept {str} -- Accept header
-        accept_query {str} -- Parameter to override 'Accept' header, 'image/png' for output bytes
+        accept {str} -- Accept header, overridden by the 'accept' query parameter
     """
-    if accept_query is not None and len(accept_query) > 0:
-        accept = accept_query
-
-    return call_worker(req, accept)
+    await buffer_request_uploads(req)
+    return await call_worker_async(req, accept)
 
 
 @secure_router.post(
         path="/v1/generation/image-prompt",
-        response_model=List[GeneratedImageResult] | AsyncJobResponse,
+        response_model=None,
         responses=img_generate_responses,
         tags=["GenerateV1"])
-def img_prompt(
-    cn_img1: Optional[UploadFile] = File(None),
-    req: ImgPromptRequest = Depends(ImgPromptRequest.as_form),
-    accept: str = Header(None),
-    accept_query: str | None = Query(
-        None, alias='accept',
-        description="Parameter to override 'Accept' header, 'image/png' for output bytes")):
+async def img_prompt(
+    req: ImgPromptForm,
+    accept: AcceptParam,
+    cn_img1: Optional[UploadFile] = File(None)):
     """\nImage Prompt\n
     Image Prompt
     A prompt-based image generation.
     Arguments:
         cn_img1 {UploadFile} -- Input image file
         req {ImgPromptRequest} -- Request body
-        accept {str} -- Accept header
-        accept_query {str} -- Parameter to override 'Accept' header, 'image/png' for output bytes
+        accept {str} -- Accept header, overridden by the 'accept' query parameter
     Returns:
         Response -- img_generate_responses
     """
-    if accept_query is not None and len(accept_query) > 0:
-        accept = accept_query
-
-    return call_worker(req, accept)
+    await buffer_request_uploads(req)
+    return await call_worker_async(req, accept)
 
 
 @secure_router.post(
         path="/v1/tools/describe-image",
         response_model=DescribeImageResponse,
         tags=["GenerateV1"])
-def describe_image(
+async def describe_image(
     image: UploadFile,
     image_type: DescribeImageType = Query(
         DescribeImageType.photo,
@@ -164,14 +238,19 @@ def describe_image(
     Returns:
         DescribeImageResponse -- Describe image response, a string
     """
-    if image_type == DescribeImageType.photo:
-        from extras.interrogate import default_interrogator as default_interrogator_photo
-        interrogator = default_interrogator_photo
-    else:
-        from extras.wd14tagger import default_interrogator as default_interrogator_anime
-        interrogator = default_interrogator_anime
-    img = HWC3(read_input_image(image))
-    result = interrogator(img)
+    image_bytes = await image.read()
+    cache_key = (image_type, hashlib.blake2b(image_bytes, digest_size=16).digest())
+    if cache_key in describe_cache:
+        describe_cache.move_to_end(cache_key)
+        return DescribeImageResponse(describe=describe_cache[cache_key])
+
+    task = describe_inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(interrogate_upload(cache_key, image_bytes, image_type))
+        describe_inflight[cache_key] = task
+        task.add_done_callback(functools.partial(describe_task_done, cache_key))
+    # Shielded so one client disconnecting doesn't cancel the others
+    result = await asyncio.shield(task)
     return DescribeImageResponse(describe=result)
 
 from extras.inpaint_mask import generate_mask_from_image
@@ -183,6 +262,7 @@ from extras.inpaint_mask import generate_mask_from_image
     path="/v1/tools/generate-mask",
     tags=["GenerateV1"])
 async def generate_mask_route(
+    background_tasks: BackgroundTasks,
     image: UploadFile,
     mask_model: str,
     cloth_category: str,
@@ -203,9 +283,10 @@ async def generate_mask_route(
         box_threshold {float} -- Box threshold (only used if mask_model is 'sam')
         text_threshold {float} -- Text threshold (only used if mask_model is 'sam')
     Returns:
-        dict -- Dictionary containing the filename and the generated mask
+        dict -- Dictionary containing the filename and the generated mask as base64 PNG
     """
-    image_data = await image.read()
+    # Read in chunks, the bytes are shared by the cache key and the decoder
+    image_bytes = (await read_upload_stream(image)).getvalue()
     extras = {}
     if mask_model == 'u2net_cloth_seg':
         extras['cloth_category'] = cloth_category
@@ -215,15 +296,22 @@ async def generate_mask_route(
         extras['sam_quant'] = sam_quant
         extras['box_threshold'] = box_threshold
         extras['text_threshold'] = text_threshold
-    mask = generate_mask_from_image(image_data, mask_model, extras)
-    return {"filename": image.filename, "mask": mask}
+
+    cache_key = await run_in_threadpool(mask_cache_key, image_bytes, mask_model, extras)
+    mask = await run_in_threadpool(get_cached_mask, cache_key)
+    if mask is None:
+        image_data = await run_in_threadpool(decode_upload_image, image_bytes)
+        mask = await run_cv_task(generate_mask_from_image, image_data, mask_model, extras)
+        background_tasks.add_task(save_cached_mask, cache_key, mask, args.mask_cache_mb)
+    mask_base64 = await run_in_threadpool(narray_to_base64img, mask)
+    return {"filename": image.filename, "mask": mask_base64}
 
 @secure_router.post(
         path="/v1/generation/stop",
         response_model=StopResponse,
         description="Job stopping",
         tags=["Default"])
-def stop():
+async def stop():
     """Interrupt worker"""
     stop_worker()
     return StopResponse(msg="success")
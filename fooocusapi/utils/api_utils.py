@@ -1,9 +1,9 @@
 """some utils for api"""
-from typing import List
+from typing import Annotated, List
 
 from fastapi import Response
 from fastapi.security import APIKeyHeader
-from fastapi import HTTPException, Security
+from fastapi import HTTPException, Security, Header, Query, Depends
 
 from modules import flags
 from modules import config
@@ -13,6 +13,7 @@ from fooocusapi.args import args
 from fooocusapi.utils.img_utils import read_input_image
 from fooocusapi.utils.file_utils import (
     get_file_serve_url,
+    read_output_file,
     output_file_to_base64img,
     output_file_to_bytesimg
 )
@@ -69,6 +70,25 @@ def api_key_auth(apikey: str = Security(api_key_header)):
         raise HTTPException(status_code=403, detail="Forbidden")
 
 
+def resolved_accept(
+        accept: str | None = Header(None),
+        accept_query: str | None = Query(
+            None, alias='accept',
+            description="Parameter to override 'Accept' header, 'image/png' for output bytes")) -> str | None:
+    """
+    Resolve the requested output type, the 'accept' query parameter overrides the header
+    Args:
+        accept: Accept header
+        accept_query: 'accept' query parameter
+    returns:
+        accept value to pass to call_worker
+    """
+    return accept_query or accept
+
+
+AcceptParam = Annotated[str | None, Depends(resolved_accept)]
+
+
 def req_to_params(req: Text2ImgRequest) -> ImageGenerationParams:
     """
     Convert Request to ImageGenerationParams
@@ -265,7 +285,14 @@ def generate_streaming_output(results: List[ImageGenerationResult]) -> Response:
     if result.finish_reason == GenerationFinishReason.error:
         return Response(status_code=500, content=result.finish_reason.value)
 
-    img_bytes = output_file_to_bytesimg(results[0].im)
+    # PNG outputs are sent as saved, other formats are converted to PNG bytes.
+    # The file is read here rather than streamed later, so the queue history
+    # cleanup can't delete it before the response is sent
+    img_bytes = None
+    if result.im is not None and result.im.endswith('.png'):
+        img_bytes = read_output_file(result.im)
+    if img_bytes is None:
+        img_bytes = output_file_to_bytesimg(result.im)
     return Response(img_bytes, media_type='image/png')
 
 
@@ -1,6 +1,8 @@
 """function for call generate worker"""
 from typing import List
 from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
 
 from fooocusapi.models.common.requests import (
     CommonRequest as Text2ImgRequest
@@ -31,7 +33,14 @@ from fooocusapi.models.requests_v2 import (
     ImgPromptRequestJson,
     ImgUpscaleOrVaryRequestJson
 )
-from fooocusapi.worker import worker_queue, blocking_get_task_result
+from fooocusapi.task_queue import QueueTask
+from fooocusapi.worker import (
+    worker_queue,
+    blocking_get_task_result,
+    async_get_task_result
+)
+
+GeneratedImageResultList = TypeAdapter(List[GeneratedImageResult])
 
 
 def get_task_type(req: Text2ImgRequest) -> TaskType:
@@ -45,14 +54,20 @@ def get_task_type(req: Text2ImgRequest) -> TaskType:
     return TaskType.text_2_img
 
 
-def call_worker(req: Text2ImgRequest, accept: str) -> Response | AsyncJobResponse | List[GeneratedImageResult]:
-    """call generation worker"""
+def json_response(content: AsyncJobResponse | List[GeneratedImageResult]) -> Response:
+    """serialize a generation result straight to a JSON response, skipping response_model validation"""
+    if isinstance(content, list):
+        body = GeneratedImageResultList.dump_json(content)
+    else:
+        body = content.model_dump_json()
+    return Response(content=body, media_type='application/json')
+
+
+def add_worker_task(req: Text2ImgRequest, accept: str) -> QueueTask | Response:
+    """add req to the worker queue, return the queued task or the queue_is_full response"""
     if accept == 'image/png':
-        streaming_output = True
         # image_number auto set to 1 in streaming mode
         req.image_number = 1
-    else:
-        streaming_output = False
 
     task_type = get_task_type(req)
     params = req_to_params(req)
@@ -67,10 +82,10 @@ def call_worker(req: Text2ImgRequest, accept: str) -> Response | AsyncJobRespons
                 finish_reason=GenerationFinishReason.queue_is_full
             )]
 
-        if streaming_output:
+        if accept == 'image/png':
             return generate_streaming_output(failure_results)
         if req.async_process:
-            return AsyncJobResponse(
+            return json_response(AsyncJobResponse(
                 job_id='',
                 job_type=get_task_type(req),
                 job_stage=AsyncJobStage.error,
@@ -82,16 +97,39 @@ def call_worker(req: Text2ImgRequest, accept: str) -> Response | AsyncJobRespons
                     url=None,
                     seed='',
                     finish_reason=GenerationFinishReason.queue_is_full
-                )])
-        return generate_image_result_output(failure_results, False)
+                )]))
+        return json_response(generate_image_result_output(failure_results, False))
 
     if req.async_process:
         # return async response directly
-        return generate_async_output(async_task)
+        return json_response(generate_async_output(async_task))
+    return async_task
+
+
+def task_result_response(req: Text2ImgRequest, accept: str, results: List[ImageGenerationResult]) -> Response:
+    """build the response of a finished blocking request"""
+    if accept == 'image/png':
+        return generate_streaming_output(results)
+    return json_response(generate_image_result_output(results, req.require_base64))
+
+
+def call_worker(req: Text2ImgRequest, accept: str) -> Response:
+    """call generation worker"""
+    async_task = add_worker_task(req, accept)
+    if isinstance(async_task, Response):
+        return async_task
 
     # blocking get generation result
     results = blocking_get_task_result(async_task.job_id)
+    return task_result_response(req, accept, results)
 
-    if streaming_output:
-        return generate_streaming_output(results)
-    return generate_image_result_output(results, req.require_base64)
+
+async def call_worker_async(req: Text2ImgRequest, accept: str) -> Response:
+    """call generation worker from an async route, waiting for the result in the event loop"""
+    async_task = await run_in_threadpool(add_worker_task, req, accept)
+    if isinstance(async_task, Response):
+        return async_task
+
+    results = await async_get_task_result(async_task.job_id)
+    # Reading outputs and base64 encoding are blocking
+    return await run_in_threadpool(task_result_response, req, accept, results)
@@ -104,6 +104,23 @@ def output_file_to_base64img(filename: str | None) -> str | None:
     return base64_str
 
 
+def read_output_file(filename: str | None) -> bytes | None:
+    """
+    Read the raw bytes of an output file.
+    Args:
+        filename: str of file name
+    return: bytes of file content, None if the file does not exist
+    """
+    if filename is None:
+        return None
+    file_path = os.path.join(output_dir, filename)
+    try:
+        with open(file_path, 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
 def output_file_to_bytesimg(filename: str | None) -> bytes | None:
     """
     Convert an image file to a bytes string.
@@ -8,8 +8,9 @@ Image process utils. Used to verify, convert and store Images.
 import base64
 from io import BytesIO
 from fastapi import UploadFile
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 
+import cv2
 import requests
 import numpy as np
 
@@ -66,11 +67,44 @@ def narray_to_bytesimg(narray) -> bytes | None:
     return byte_data
 
 
-def read_input_image(input_image: UploadFile | str | None) -> np.ndarray | None:
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def read_upload_stream(image: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> BytesIO:
+    """
+    Read an UploadFile chunk by chunk into an in-memory buffer.
+    Args:
+        image: UploadFile
+        chunk_size: bytes read per await
+    Returns:
+        BytesIO positioned at the start
+    """
+    buffer = BytesIO()
+    while chunk := await image.read(chunk_size):
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+async def buffer_upload(image: UploadFile | None) -> UploadFile | None:
+    """
+    Await the whole body of an UploadFile and wrap it in an in-memory stream,
+    so later sync reads never touch the spooled temp file.
+    Args:
+        image: UploadFile or None
+    Returns:
+        UploadFile backed by BytesIO, or None
+    """
+    if image is None:
+        return None
+    return UploadFile(file=await read_upload_stream(image), filename=image.filename)
+
+
+def read_input_image(input_image: UploadFile | str | bytes | None) -> np.ndarray | None:
     """
-    Read input image from UploadFile or base64 string.
+    Read input image from UploadFile, base64 string or raw bytes.
     Args:
-        input_image: UploadFile, or base64 image string, or None
+        input_image: UploadFile, or base64 image string, or image bytes, or None
     Returns:
         numpy array of image
     """
@@ -78,6 +112,8 @@ def read_input_image(input_image: UploadFile | str | None) -> np.ndarray | None:
         return None
     if isinstance(input_image, str):
         input_image_bytes = base64.b64decode(input_image)
+    elif isinstance(input_image, bytes):
+        input_image_bytes = input_image
     else:
         input_image_bytes = input_image.file.read()
     pil_image = Image.open(BytesIO(input_image_bytes))
@@ -85,6 +121,37 @@ def read_input_image(input_image: UploadFile | str | None) -> np.ndarray | None:
     return image
 
 
+def bytesimg_to_narray(image_data: bytes) -> np.ndarray | None:
+    """
+    Decode image bytes straight to a contiguous uint8 array with OpenCV, in
+    RGB channel order. Alpha and grayscale are kept as decoded, so callers
+    still pass non 3-channel results through HWC3, as with PIL.
+    EXIF orientation is ignored, like PIL.
+    The header is parsed by PIL first, so Image.MAX_IMAGE_PIXELS still applies.
+    Args:
+        image_data: image bytes
+    Returns:
+        HxW, HxWx3 (RGB) or HxWx4 (RGBA) uint8 numpy array,
+        None if OpenCV cannot decode it to 8 bits per channel
+    Raises:
+        Image.DecompressionBombError: image is larger than PIL allows
+    """
+    # PIL only reads the header here, its decompression bomb check
+    # has to run before OpenCV allocates the full image
+    try:
+        Image.open(BytesIO(image_data)).close()
+    except UnidentifiedImageError:
+        return None
+    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None or image.dtype != np.uint8:
+        return None
+    if image.ndim == 3 and image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if image.ndim == 3 and image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    return image
+
+
 def base64_to_stream(image: str) -> UploadFile | None:
     """
     Convert base64 image string to UploadFile.
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+On-disk cache for generated masks
+
+@file: mask_cache.py
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+from fooocusapi.utils.logger import logger
+
+
+mask_cache_dir = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '../..', 'outputs', 'mask_cache'))
+os.makedirs(mask_cache_dir, exist_ok=True)
+
+# Cached masks in least recently used order, key -> file size in bytes.
+# Built from one directory scan on first use, then kept in sync in memory.
+mask_cache_index: OrderedDict[str, int] | None = None
+mask_cache_bytes = 0
+mask_cache_lock = threading.Lock()
+
+
+def mask_cache_path(key: str) -> str:
+    """return the file path of a cache key"""
+    return os.path.join(mask_cache_dir, key + '.png')
+
+
+def load_mask_cache_index() -> OrderedDict[str, int]:
+    """
+    Return mask_cache_index, scanning the cache dir the first time.
+    Caller must hold mask_cache_lock.
+    """
+    global mask_cache_index, mask_cache_bytes
+    if mask_cache_index is None:
+        entries = []
+        for entry in os.scandir(mask_cache_dir):
+            if entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len('.png')], stat.st_size))
+        entries.sort()
+        mask_cache_index = OrderedDict((key, size) for _, key, size in entries)
+        mask_cache_bytes = sum(mask_cache_index.values())
+    return mask_cache_index
+
+
+def mask_cache_key(image_data: bytes, mask_model: str, extras: dict) -> str:
+    """
+    Build the cache key of a mask, generated masks only depend on these inputs
+    Args:
+        image_data: uploaded image bytes
+        mask_model: mask model name
+        extras: mask model extra parameters
+    Returns:
+        str of hex digest
+    """
+    key = hashlib.blake2b(image_data, digest_size=16)
+    key.update(b'|' + mask_model.encode('utf-8') + b'|')
+    key.update(json.dumps(extras, sort_keys=True).encode('utf-8'))
+    return key.hexdigest()
+
+
+def get_cached_mask(key: str) -> np.ndarray | None:
+    """
+    Load a cached mask
+    Args:
+        key: cache key from mask_cache_key
+    Returns:
+        mask as np.ndarray, None on miss
+    """
+    with mask_cache_lock:
+        index = load_mask_cache_index()
+        if key not in index:
+            return None
+        index.move_to_end(key)
+    file_path = mask_cache_path(key)
+    mask = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+    if mask is None:
+        logger.std_warn(f'[Fooocus API] Broken mask cache file: {key}')
+        return None
+    # Touch the file so the order survives a restart
+    try:
+        os.utime(file_path)
+    except OSError:
+        pass
+    return mask
+
+
+def save_cached_mask(key: str, mask: np.ndarray, max_mb: int):
+    """
+    Save a mask to the cache as PNG, evicting least recently used masks
+    once the cache is over max_mb
+    Args:
+        key: cache key from mask_cache_key
+        mask: generated mask
+        max_mb: max cache size on disk in MB, 0 disables the cache
+    """
+    global mask_cache_bytes
+    if max_mb <= 0 or not isinstance(mask, np.ndarray) or mask.dtype != np.uint8:
+        return
+    ok, buffer = cv2.imencode('.png', mask)
+    if not ok:
+        return
+    file_path = mask_cache_path(key)
+    tmp_path = file_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(buffer)
+        os.replace(tmp_path, file_path)
+    except OSError:
+        logger.std_error(f'[Fooocus API] Save mask cache failed: {key}')
+        return
+
+    evicted = []
+    with mask_cache_lock:
+        index = load_mask_cache_index()
+        mask_cache_bytes += buffer.size - index.pop(key, 0)
+        index[key] = buffer.size
+        while mask_cache_bytes > max_mb * 1024 * 1024 and len(index) > 1:
+            old_key, size = index.popitem(last=False)
+            mask_cache_bytes -= size
+            evicted.append(old_key)
+    for old_key in evicted:
+        try:
+            os.remove(mask_cache_path(old_key))
+        except OSError:
+            pass
@@ -1,6 +1,7 @@
 """
 Worker, modify from https://github.com/lllyasviel/Fooocus/blob/main/modules/async_worker.py
 """
+import asyncio
 import copy
 import os
 import random
@@ -12,6 +13,7 @@ import torch
 
 from fooocusapi.models.common.image_meta import image_parse
 from modules.patch import PatchSettings, patch_settings, patch_all
+import ldm_patched.modules.model_management
 from modules.sdxl_styles import apply_arrays
 from modules.flags import Performance
 
@@ -35,7 +37,6 @@ last_model_name = None
 
 def process_stop():
     """Stop process"""
-    import ldm_patched.modules.model_management
     ldm_patched.modules.model_management.interrupt_current_processing()
 
 
@@ -77,6 +78,28 @@ def blocking_get_task_result(job_id: str) -> List[ImageGenerationResult]:
     return task.task_result
 
 
+async def async_get_task_result(job_id: str) -> List[ImageGenerationResult]:
+    """
+    Get task result, when async_task is false, polling without holding a thread
+    :param job_id:
+    :return:
+    """
+    waiting_sleep_steps: int = 0
+    waiting_start_time = time.perf_counter()
+    while not worker_queue.is_task_finished(job_id):
+        if waiting_sleep_steps == 0:
+            logger.std_info(f"[Task Queue] Waiting for task finished, job_id={job_id}")
+        delay = 0.05
+        await asyncio.sleep(delay)
+        waiting_sleep_steps += 1
+        if waiting_sleep_steps % int(10 / delay) == 0:
+            waiting_time = time.perf_counter() - waiting_start_time
+            logger.std_info(f"[Task Queue] Already waiting for {round(waiting_time, 1)} seconds, job_id={job_id}")
+
+    task = worker_queue.get_task(job_id, True)
+    return task.task_result
+
+
 @torch.no_grad()
 @torch.inference_mode()
 def process_generate(async_task: QueueTask):